@@ -0,0 +1,267 @@
+from typing import Dict, Iterator, List, Optional, Set
+import ast
+import hashlib
+import os
+
+import pytest
+
+# Define the pytest cache key for the test impact map
+CACHE_KEY_IMPACT = "impact/map"
+
+# Define the files that, if changed, invalidate the test impact map, relative to the root folder
+FILES_CONFIG = ["conftest.py", "pytest.ini", ".coveragerc", "requirements.txt"]
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the `--impacted` command line option to pytest."""
+    parser.addoption(
+        "--impacted", action="store_true", default=False,
+        help="Only run tests and doctests affected by changes to `src` since the last run; runs the full suite, and "
+             "records a new test impact map, if the map is missing or stale."
+    )
+
+
+def _hash_files(root: str, folder: str) -> Dict[str, str]:
+    """Hash the contents of all Python files in a folder.
+
+    Args:
+        root (str): Folder path to the root folder.
+        folder (str): Folder path to hash, relative to root.
+
+    Returns:
+        A dictionary where the keys are the file paths relative to root, using "/" separators to match pytest node IDs,
+        and the values are their hashes.
+
+    """
+    hashes = {}
+    for dirpath, dirs, filenames in os.walk(os.path.join(root, folder)):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for filename in filenames:
+            if filename.endswith(".py"):
+                path_file = os.path.join(dirpath, filename)
+                with open(path_file, "rb") as f:
+                    hashes[os.path.relpath(path_file, root).replace(os.sep, "/")] = hashlib.sha1(f.read()).hexdigest()
+    return hashes
+
+
+def _hash_config(root: str, test_hashes: Dict[str, str]) -> str:
+    """Hash the contents of the files in `FILES_CONFIG`, and the support files in `tests`, into a single hash.
+
+    Support files are any Python files in `tests` that are not test files, such as `conftest.py` files and helper
+    modules. Coverage only measures `src`, so the tests using them are unknown; any change to them invalidates the test
+    impact map instead.
+
+    Args:
+        root (str): Folder path to the root folder.
+        test_hashes (Dict[str, str]): Hashes of the Python files in `tests`, as returned by `_hash_files`.
+
+    Returns:
+        A hash of the configuration, and support files.
+
+    """
+    digest = hashlib.sha1()
+    for filename in FILES_CONFIG:
+        path_file = os.path.join(root, filename)
+        if os.path.isfile(path_file):
+            with open(path_file, "rb") as f:
+                digest.update(f.read())
+    for path_file, file_hash in sorted(test_hashes.items()):
+        if not os.path.basename(path_file).startswith("test_"):
+            digest.update(f"{path_file}:{file_hash}".encode())
+    return digest.hexdigest()
+
+
+def _imported_src_files(root: str, path_test: str, src_files: Set[str]) -> Set[str]:
+    """Get the `src` files statically imported by a test file.
+
+    Module-level code in `src` runs once, when it is first imported during test collection, so coverage alone cannot
+    attribute it to individual tests. Tests are therefore also treated as depending on every `src` file their test
+    file imports.
+
+    Args:
+        root (str): Folder path to the root folder.
+        path_test (str): File path to the test file, relative to root.
+        src_files (Set[str]): File paths to all the `src` files, relative to root.
+
+    Returns:
+        The file paths of the `src` files imported by path_test, relative to root.
+
+    """
+    try:
+        with open(os.path.join(root, path_test), "rb") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError):
+        return set()
+
+    # Get all the absolute module names imported by the test file
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.update([node.module] + [f"{node.module}.{a.name}" for a in node.names])
+
+    # Convert the module names to file paths, and any parent packages' `__init__.py` files
+    candidates = set()
+    for module in modules:
+        parts = module.split(".")
+        for i in range(1, len(parts) + 1):
+            candidates.update(["/".join(parts[:i]) + ".py", "/".join(parts[:i] + ["__init__.py"])])
+    return candidates.intersection(src_files)
+
+
+class ImpactPlugin:
+    """Pytest plugin to record a per-test coverage map of `src`, and select only the tests affected by changes.
+
+    For each test, the map stores the hash of every file the test depends on, as it was when the test last ran. A test
+    is selected if any of those files has changed since, so a test's baseline only moves forward when it actually
+    runs; tests deselected by `-k`, file arguments, or `--impacted` itself keep their old baseline.
+
+    Args:
+        config (pytest.Config): Pytest configuration.
+
+    """
+
+    def __init__(self, config: pytest.Config) -> None:
+        from coverage import Coverage
+
+        self.config = config
+        self.root = str(config.rootpath)
+        test_hashes = _hash_files(self.root, "tests")
+        self.hashes = {**_hash_files(self.root, "src"), **test_hashes}
+        self.src_files = sorted(p for p in self.hashes if p.startswith("src/"))
+        self.config_hash = _hash_config(self.root, test_hashes)
+        self.previous = config.cache.get(CACHE_KEY_IMPACT, None)
+
+        # Initialise a dictionary of the tests that ran, where the values are True if the test failed, and a flag for
+        # whether every collected test was deselected as unaffected
+        self.ran: Dict[str, bool] = {}
+        self.deselected_all = False
+
+        # Start measuring coverage with no data file, so nothing is written to the `.coverage` file
+        self.coverage = Coverage(data_file=None, source=[os.path.join(self.root, "src")], config_file=False)
+        self.coverage.start()
+
+    def _stale_reason(self) -> Optional[str]:
+        """Get the reason the previous test impact map cannot be used, if any.
+
+        Returns:
+            A description of why the map is stale, or None if the map can be used.
+
+        """
+        if self.previous is None:
+            return "no test impact map recorded"
+        if self.previous["config_hash"] != self.config_hash:
+            return "test configuration or `tests` support files changed"
+        if self.previous["src_files"] != self.src_files:
+            return "`src` files added or removed"
+        return None
+
+    def _is_affected(self, nodeid: str) -> bool:
+        """Check whether a test needs to run, as it is new, failed last time, or a file it depends on has changed.
+
+        Args:
+            nodeid (str): Pytest node ID of the test.
+
+        Returns:
+            True if the test needs to run, otherwise False.
+
+        """
+        entry = self.previous["tests"].get(nodeid)
+        if entry is None or entry["failed"]:
+            return True
+        return any(self.hashes.get(p) != h for p, h in entry["dependencies"].items())
+
+    def pytest_report_header(self) -> str:
+        """Report whether pytest is running a selected subset of tests, or the full suite."""
+        reason = self._stale_reason()
+        return f"impacted: running full suite ({reason})" if reason else "impacted: selecting affected tests"
+
+    def pytest_collection_modifyitems(self, config: pytest.Config, items: List[pytest.Item]) -> None:
+        """Deselect tests not affected by changes since they last ran."""
+        if self._stale_reason():
+            return
+
+        selected, deselected = [], []
+        for item in items:
+            (selected if self._is_affected(item.nodeid) else deselected).append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+        self.deselected_all = bool(deselected) and not selected
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item: pytest.Item) -> Iterator[None]:
+        """Attribute all coverage during a test, including its setup and teardown, to the test's node ID."""
+        self.coverage.switch_context(item.nodeid)
+        yield
+        self.coverage.switch_context("")
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        """Record each test that ran to completion, and whether it failed."""
+        if report.when == "teardown":
+            self.ran[report.nodeid] = self.ran.get(report.nodeid, False) or report.failed
+        elif report.failed:
+            self.ran[report.nodeid] = True
+
+    def _dependencies(self) -> Dict[str, Set[str]]:
+        """Get the files each test that ran depends on.
+
+        These are the `src` files it covered, the `src` files its test file imports, and the file it is defined in.
+
+        Returns:
+            A dictionary where the keys are node IDs of the tests that ran, and the values are file paths relative to
+            the root folder.
+
+        """
+        dependencies: Dict[str, Set[str]] = {nodeid: {nodeid.split("::")[0]} for nodeid in self.ran}
+        data = self.coverage.get_data()
+        for path_file in data.measured_files():
+            path_relative = os.path.relpath(path_file, self.root).replace(os.sep, "/")
+            for contexts in data.contexts_by_lineno(path_file).values():
+                for context in dependencies.keys() & set(contexts):
+                    dependencies[context].add(path_relative)
+
+        imports: Dict[str, Set[str]] = {}
+        for nodeid, files in dependencies.items():
+            path_test = nodeid.split("::")[0]
+            if path_test not in imports:
+                imports[path_test] = _imported_src_files(self.root, path_test, set(self.src_files))
+            files.update(imports[path_test])
+        return dependencies
+
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int) -> None:
+        """Update the test impact map entries of the tests that ran, and save it to the pytest cache."""
+        self.coverage.stop()
+
+        # Exit successfully if no tests were affected, rather than with pytest's "no tests collected" exit code, as this
+        # is the expected result when nothing has changed
+        if self.deselected_all and exitstatus == pytest.ExitCode.NO_TESTS_COLLECTED:
+            session.exitstatus = pytest.ExitCode.OK
+
+        # Do not save the map if the session was interrupted, or stopped early by `-x` or `--maxfail`, as coverage for
+        # the last test may be incomplete
+        if exitstatus == pytest.ExitCode.INTERRUPTED or session.shouldfail or session.shouldstop:
+            return
+
+        # Replace only the entries of the tests that ran; if the map was stale, start a new map, so tests that did not
+        # run are treated as new next time
+        tests = {} if self._stale_reason() else dict(self.previous["tests"])
+        for nodeid, files in self._dependencies().items():
+            tests[nodeid] = {
+                "failed": self.ran[nodeid],
+                "dependencies": {p: self.hashes[p] for p in sorted(files) if p in self.hashes},
+            }
+        self.config.cache.set(CACHE_KEY_IMPACT, {
+            "config_hash": self.config_hash,
+            "src_files": self.src_files,
+            "tests": tests,
+        })
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Register the test impact plugin if the `--impacted` option is used."""
+    if config.getoption("impacted"):
+        if not hasattr(config, "cache"):
+            raise pytest.UsageError("`--impacted` requires the pytest cache; do not disable the cacheprovider plugin")
+        config.pluginmanager.register(ImpactPlugin(config), "impact")
@@ -0,0 +1,226 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+import argparse
+import os
+import pickle
+import time
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Load the environment variables for the processed data, and outputs folders
+DIR_DATA_PROCESSED = os.getenv("DIR_DATA_PROCESSED")
+DIR_OUTPUTS = os.getenv("DIR_OUTPUTS")
+
+# Define the model loaded by each worker process; this is set once per worker by `_load_model`, so the model is not
+# re-loaded, or pickled and sent, for every micro-batch
+_MODEL: Any = None
+
+
+def _load_model(path_model: str) -> None:
+    """Load a pickled model into the current worker process.
+
+    Args:
+        path_model (str): File path to a pickled model with a `predict` method.
+
+    Returns:
+        None. The model is assigned to the module-level `_MODEL` variable.
+
+    """
+    global _MODEL
+    with open(path_model, "rb") as f:
+        _MODEL = pickle.load(f)
+
+
+def _predict_batch(batch: pa.RecordBatch) -> pa.Array:
+    """Score a single micro-batch using the model loaded in the current worker process.
+
+    Args:
+        batch (pa.RecordBatch): Micro-batch of the feature columns of the input rows.
+
+    Returns:
+        A pyarrow array of predictions, with one value per row in batch.
+
+    """
+    return pa.array(_MODEL.predict(batch.to_pandas()))
+
+
+def _write_predictions(writer: Optional[pq.ParquetWriter], path_output: str, batch: pa.RecordBatch,
+                       predictions: pa.Array, id_columns: Optional[List[str]],
+                       prediction_column: str) -> pq.ParquetWriter:
+    """Append a micro-batch of predictions, and any identifier columns, to a Parquet file.
+
+    Args:
+        writer (Optional[pq.ParquetWriter]): Open Parquet writer; if None, a new one is created at path_output using
+            the schema of the first micro-batch.
+        path_output (str): File path to the output Parquet file.
+        batch (pa.RecordBatch): Micro-batch of input rows that predictions were made on.
+        predictions (pa.Array): Predictions for batch.
+        id_columns (Optional[List[str]]): Columns in batch to carry through to the output alongside predictions.
+        prediction_column (str): Name of the output column containing the predictions.
+
+    Returns:
+        The open Parquet writer.
+
+    """
+
+    # Build the output table from the identifier columns, and the predictions
+    columns = [batch.column(c) for c in id_columns or []] + [predictions]
+    table = pa.Table.from_arrays(columns, names=(id_columns or []) + [prediction_column])
+
+    # Open the writer on the first micro-batch, as the prediction type is only known once the model has been run
+    if writer is None:
+        writer = pq.ParquetWriter(path_output, table.schema)
+    writer.write_table(table)
+    return writer
+
+
+def _score_to_file(path_model: str, batches: Iterator[pa.RecordBatch], path_file: str, schema_empty: pa.Schema,
+                   max_workers: int, max_in_flight: int, feature_columns: List[str], id_columns: Optional[List[str]],
+                   prediction_column: str) -> int:
+    """Score micro-batches across a process pool, and write the predictions to a Parquet file in input order.
+
+    Args:
+        path_model (str): File path to a pickled model with a `predict` method that accepts a pandas DataFrame.
+        batches (Iterator[pa.RecordBatch]): Micro-batches of input rows.
+        path_file (str): File path to the output Parquet file.
+        schema_empty (pa.Schema): Schema of the output file if there are no input rows, as the prediction type is
+            otherwise only known once the model has been run.
+        max_workers (int): Number of worker processes.
+        max_in_flight (int): Maximum number of micro-batches submitted to the workers, but not yet written.
+        feature_columns (List[str]): Columns passed to the model.
+        id_columns (Optional[List[str]]): Columns to carry through to the output alongside the predictions.
+        prediction_column (str): Name of the output column containing the predictions.
+
+    Returns:
+        The number of rows scored.
+
+    """
+
+    writer = None
+    n_rows = 0
+    in_flight: Deque[Tuple[pa.RecordBatch, Future]] = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_load_model, initargs=(path_model,)) as pool:
+            for batch in batches:
+                if batch.num_rows == 0:
+                    continue
+
+                # Send only the feature columns to the workers; identifier columns are kept here for writing
+                in_flight.append((batch, pool.submit(_predict_batch, batch.select(feature_columns))))
+
+                # Write the oldest micro-batch once the maximum number in flight is reached, preserving row order
+                if len(in_flight) >= max_in_flight:
+                    done_batch, future = in_flight.popleft()
+                    writer = _write_predictions(writer, path_file, done_batch, future.result(), id_columns,
+                                                prediction_column)
+                    n_rows += done_batch.num_rows
+
+            # Write any remaining micro-batches
+            while in_flight:
+                done_batch, future = in_flight.popleft()
+                writer = _write_predictions(writer, path_file, done_batch, future.result(), id_columns,
+                                            prediction_column)
+                n_rows += done_batch.num_rows
+
+        # Write an empty file with the expected schema if there are no input rows
+        if writer is None:
+            writer = pq.ParquetWriter(path_file, schema_empty)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+def batch_predict(path_model: str, path_input: str, path_output: str, file_format: str = "parquet",
+                  batch_size: int = 65_536, max_workers: Optional[int] = None,
+                  feature_columns: Optional[List[str]] = None, id_columns: Optional[List[str]] = None,
+                  prediction_column: str = "prediction") -> Dict[str, float]:
+    """Score input data in micro-batches across a process pool, and write predictions to a Parquet file.
+
+    Input data is streamed, so only a bounded number of micro-batches are held in memory at any one time. The model is
+    loaded once per worker process, and predictions are written incrementally in the same order as the input rows.
+    Predictions are written to a temporary file, which only replaces path_output if every row is scored, so a failed
+    run never leaves a partial output file. If there are no input rows, an empty file is written, with a float
+    prediction column.
+
+    Args:
+        path_model (str): File path to a pickled model with a `predict` method that accepts a pandas DataFrame.
+        path_input (str): File path to an input file, or a folder of input files, to score.
+        path_output (str): File path to the output Parquet file.
+        file_format (str): Default: parquet. Format of the input files; any format supported by `pyarrow.dataset`,
+            for example "parquet" or "csv".
+        batch_size (int): Default: 65,536. Maximum number of rows in each micro-batch.
+        max_workers (Optional[int]): Default: None. Number of worker processes; if None, this is the number of CPUs.
+        feature_columns (Optional[List[str]]): Default: None. Columns passed to the model; if None, all columns except
+            id_columns are used.
+        id_columns (Optional[List[str]]): Default: None. Columns to carry through to the output alongside the
+            predictions, for example a unique row identifier.
+        prediction_column (str): Default: prediction. Name of the output column containing the predictions.
+
+    Returns:
+        A dictionary with the number of rows scored, the elapsed time in seconds, and the throughput in rows per
+        second.
+
+    """
+
+    # Define the number of worker processes, and the maximum number of micro-batches in flight at any one time; this
+    # bounds memory usage, whilst keeping all the workers busy
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = 2 * max_workers
+
+    # Use all the columns except the identifier columns as features, if the feature columns are not specified
+    dataset = ds.dataset(path_input, format=file_format)
+    if feature_columns is None:
+        feature_columns = [c for c in dataset.schema.names if c not in (id_columns or [])]
+
+    # Stream the input data as micro-batches, reading only the required columns, and reading ahead no more
+    # micro-batches than can be in flight, from one file at a time
+    columns = list(dict.fromkeys((id_columns or []) + feature_columns))
+    batches = dataset.to_batches(columns=columns, batch_size=batch_size, batch_readahead=max_in_flight,
+                                 fragment_readahead=1)
+    schema_empty = pa.schema([dataset.schema.field(c) for c in id_columns or []] + [(prediction_column, pa.float64())])
+
+    # Create the output folder, if it doesn't exist
+    os.makedirs(os.path.dirname(os.path.abspath(path_output)), exist_ok=True)
+
+    # Score the input data into a temporary file, and only replace the output file if scoring succeeds
+    path_temp = f"{path_output}.tmp"
+    start = time.perf_counter()
+    try:
+        n_rows = _score_to_file(path_model, batches, path_temp, schema_empty, max_workers, max_in_flight,
+                                feature_columns, id_columns, prediction_column)
+        os.replace(path_temp, path_output)
+    except BaseException:
+        if os.path.exists(path_temp):
+            os.remove(path_temp)
+        raise
+
+    # Calculate the throughput
+    elapsed = time.perf_counter() - start
+    return {"rows": n_rows, "seconds": elapsed, "rows_per_second": n_rows / elapsed if elapsed > 0 else 0.0}
+
+
+if __name__ == "__main__":
+
+    # Parse the command line arguments
+    parser = argparse.ArgumentParser(description="Score data in micro-batches across a process pool.")
+    parser.add_argument("model", help="File path to a pickled model with a `predict` method.")
+    parser.add_argument("input", help="Input file or folder, relative to `DIR_DATA_PROCESSED`.")
+    parser.add_argument("output", help="Output Parquet file, relative to `DIR_OUTPUTS`.")
+    parser.add_argument("--format", default="parquet", help="Input file format, for example parquet or csv.")
+    parser.add_argument("--batch-size", type=int, default=65_536, help="Maximum number of rows per micro-batch.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--features", nargs="+", default=None,
+                        help="Columns passed to the model; defaults to all columns except `--ids`.")
+    parser.add_argument("--ids", nargs="+", default=None, help="Columns to carry through to the output.")
+    args = parser.parse_args()
+
+    # Score the input data, and report the throughput
+    stats = batch_predict(args.model, os.path.join(DIR_DATA_PROCESSED or "", args.input),
+                          os.path.join(DIR_OUTPUTS or "", args.output), file_format=args.format,
+                          batch_size=args.batch_size, max_workers=args.workers, feature_columns=args.features,
+                          id_columns=args.ids)
+    print(f"Scored {stats['rows']:,} rows in {stats['seconds']:.2f}s ({stats['rows_per_second']:,.0f} rows/s)")
@@ -0,0 +1,283 @@
+from datetime import datetime
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Tuple, Type
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Load the environment variable for the `outputs` folder
+DIR_OUTPUTS = os.getenv("DIR_OUTPUTS")
+
+# Define the schema of the metrics files; each row is a single metric value
+SCHEMA_METRICS = pa.schema([
+    ("step", pa.int64()),
+    ("key", pa.string()),
+    ("value", pa.float64()),
+    ("timestamp", pa.float64()),
+])
+
+
+def _default_runs_folder() -> str:
+    """Get the default folder for run logs, which is a `runs` folder in the `outputs` folder.
+
+    Returns:
+        The folder path to the default run logs folder.
+
+    """
+    if DIR_OUTPUTS is None:
+        raise EnvironmentError("`DIR_OUTPUTS` is not set; load the environment variables, or pass `path_runs`")
+    return os.path.join(DIR_OUTPUTS, "runs")
+
+
+class RunLogger:
+    """Log the parameters and metrics of a run with low overhead.
+
+    Metrics are buffered in memory, and written in batches by a background thread to an append-only Arrow IPC stream
+    file, so logging does not block on disk writes. The buffer is bounded; if it fills faster than it can be written,
+    logging waits until there is space. Any buffered metrics are written when the logger is closed, when used as a
+    context manager, or when Python exits.
+
+    Args:
+        params (Optional[Dict[str, Any]]): Default: None. JSON-serialisable run parameters, such as hyperparameters.
+        run_id (Optional[str]): Default: None. Unique identifier for the run; if None, one is generated from the
+            current date and time.
+        path_runs (Optional[str]): Default: None. Folder path to store run logs; if None, this is a `runs` folder in
+            `DIR_OUTPUTS`.
+        max_buffer (int): Default: 1,000,000. Maximum number of metric values held in memory.
+        flush_every (int): Default: 10,000. Number of buffered metric values that triggers a write.
+        flush_interval (float): Default: 1.0. Maximum number of seconds between writes.
+
+    """
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None, run_id: Optional[str] = None,
+                 path_runs: Optional[str] = None, max_buffer: int = 1_000_000, flush_every: int = 10_000,
+                 flush_interval: float = 1.0) -> None:
+
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.path_run = os.path.join(path_runs or _default_runs_folder(), self.run_id)
+        self.max_buffer = max_buffer
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        # Create the run folder, and write the run parameters
+        os.makedirs(self.path_run, exist_ok=False)
+        with open(os.path.join(self.path_run, "params.json"), "w") as f:
+            json.dump({"run_id": self.run_id, "start_time": time.time(), "params": params or {}}, f, default=str)
+
+        # Initialise the buffer, and the condition used to signal between the logging and writer threads
+        self._buffer: List[Tuple[Optional[int], str, float, float]] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._error: Optional[BaseException] = None
+
+        # Open the metrics file, and start the background writer thread
+        self._writer = pa.ipc.new_stream(os.path.join(self.path_run, "metrics.arrows"), SCHEMA_METRICS)
+        self._thread = threading.Thread(target=self._run_writer, name=f"RunLogger-{self.run_id}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, metrics: Dict[str, float], step: Optional[int] = None) -> None:
+        """Log one or more metric values.
+
+        Args:
+            metrics (Dict[str, float]): Metric names, and their values.
+            step (Optional[int]): Default: None. Step, such as the epoch or iteration, the metrics were recorded at.
+
+        Returns:
+            None. The metric values are buffered, and written by the background writer thread.
+
+        """
+
+        # Convert the values before buffering, so invalid values raise an error here, rather than in the writer thread
+        timestamp = time.time()
+        step = None if step is None else int(step)
+        rows = [(step, str(k), float(v), timestamp) for k, v in metrics.items()]
+
+        with self._condition:
+            if self._closed:
+                raise ValueError(f"Cannot log to a closed run: {self.run_id}")
+
+            # Wait for the writer thread to make space if the buffer is full, unless the writer thread has failed
+            while len(self._buffer) >= self.max_buffer and self._error is None:
+                self._condition.notify_all()
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.flush_every:
+                self._condition.notify_all()
+
+    def _write(self, rows: List[Tuple[Optional[int], str, float, float]]) -> None:
+        """Write a batch of buffered metric values to the metrics file.
+
+        Args:
+            rows (List[Tuple[Optional[int], str, float, float]]): Buffered rows of step, key, value, and timestamp.
+
+        Returns:
+            None. The rows are appended to the metrics file.
+
+        """
+        steps, keys, values, timestamps = zip(*rows)
+        self._writer.write_batch(pa.record_batch([pa.array(c, type=t) for c, t in zip(
+            (steps, keys, values, timestamps), SCHEMA_METRICS.types
+        )], schema=SCHEMA_METRICS))
+
+    def _run_writer(self) -> None:
+        """Write buffered metric values in batches until the logger is closed, and the buffer is empty.
+
+        If writing fails, the error is stored, and re-raised by the next call to `log` or `close`, so they do not wait
+        for a writer thread that has stopped.
+
+        """
+        try:
+            while True:
+                with self._condition:
+
+                    # Wait unless there is enough to write, or the buffer is full; `log` may have signalled a full
+                    # buffer whilst this thread was writing, so the buffer size must be checked before waiting
+                    if not self._closed and len(self._buffer) < min(self.flush_every, self.max_buffer):
+                        self._condition.wait(self.flush_interval)
+
+                    # Swap the buffer for an empty one, so logging can continue whilst the rows are written
+                    rows, self._buffer = self._buffer, []
+                    closed = self._closed
+                    self._condition.notify_all()
+
+                if rows:
+                    self._write(rows)
+                if closed:
+                    self._writer.close()
+                    return
+        except Exception as error:
+            with self._condition:
+                self._error = error
+                self._buffer = []
+                self._condition.notify_all()
+
+    def close(self) -> None:
+        """Write any buffered metric values, and close the metrics file.
+
+        Raises any error from the writer thread, as some metric values will not have been written.
+
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> "RunLogger":
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+
+def _read_metrics(path_metrics: str) -> pa.Table:
+    """Read a metrics file, ignoring any incomplete batch at the end from a run that did not close cleanly.
+
+    Args:
+        path_metrics (str): File path to the metrics file.
+
+    Returns:
+        A table of the metric values.
+
+    """
+    batches = []
+    try:
+        with pa.ipc.open_stream(path_metrics) as reader:
+            for batch in reader:
+                batches.append(batch)
+    except (pa.ArrowInvalid, OSError):
+        pass
+    return pa.Table.from_batches(batches, schema=SCHEMA_METRICS)
+
+
+def list_runs(path_runs: Optional[str] = None) -> pd.DataFrame:
+    """List all logged runs, and their parameters.
+
+    Args:
+        path_runs (Optional[str]): Default: None. Folder path to the run logs; if None, this is a `runs` folder in
+            `DIR_OUTPUTS`.
+
+    Returns:
+        A DataFrame with one row per run, oldest first, with its run ID, start time, and a column per parameter.
+
+    """
+    path_runs = path_runs or _default_runs_folder()
+    records = []
+    for run_id in os.listdir(path_runs) if os.path.isdir(path_runs) else []:
+        path_params = os.path.join(path_runs, run_id, "params.json")
+        if os.path.isfile(path_params):
+            with open(path_params) as f:
+                run = json.load(f)
+            records.append({"run_id": run["run_id"], "start_time": run["start_time"], **run["params"]})
+    runs = pd.DataFrame.from_records(records, columns=None if records else ["run_id", "start_time"])
+    return runs.sort_values("start_time", ignore_index=True)
+
+
+def load_metrics(run_ids: Optional[List[str]] = None, keys: Optional[List[str]] = None,
+                 path_runs: Optional[str] = None) -> pd.DataFrame:
+    """Load the logged metric values of one or more runs.
+
+    Args:
+        run_ids (Optional[List[str]]): Default: None. Runs to load; if None, all runs are loaded.
+        keys (Optional[List[str]]): Default: None. Metric names to load; if None, all metrics are loaded.
+        path_runs (Optional[str]): Default: None. Folder path to the run logs; if None, this is a `runs` folder in
+            `DIR_OUTPUTS`.
+
+    Returns:
+        A DataFrame with one row per metric value, with columns run_id, step, key, value, and timestamp.
+
+    """
+    path_runs = path_runs or _default_runs_folder()
+    tables = []
+    for run_id in run_ids if run_ids is not None else list_runs(path_runs)["run_id"]:
+        table = _read_metrics(os.path.join(path_runs, run_id, "metrics.arrows"))
+
+        # Filter to the selected metrics before converting to pandas
+        if keys is not None:
+            table = table.filter(pc.is_in(table["key"], value_set=pa.array(keys, type=pa.string())))
+        tables.append(table.add_column(0, "run_id", pa.array([run_id] * table.num_rows, type=pa.string())))
+
+    if not tables:
+        return pd.DataFrame(columns=["run_id"] + SCHEMA_METRICS.names)
+    return pa.concat_tables(tables).to_pandas()
+
+
+def compare_runs(keys: Optional[List[str]] = None, run_ids: Optional[List[str]] = None, aggregate: str = "last",
+                 path_runs: Optional[str] = None) -> pd.DataFrame:
+    """Compare runs by their parameters, and a summary of each metric.
+
+    Args:
+        keys (Optional[List[str]]): Default: None. Metric names to compare; if None, all metrics are compared.
+        run_ids (Optional[List[str]]): Default: None. Runs to compare; if None, all runs are compared.
+        aggregate (str): Default: last. How to summarise each metric over a run; any pandas aggregation, such as
+            "last", "min", "max", or "mean".
+        path_runs (Optional[str]): Default: None. Folder path to the run logs; if None, this is a `runs` folder in
+            `DIR_OUTPUTS`.
+
+    Returns:
+        A DataFrame with one row per run, with its parameters, and a column per metric.
+
+    """
+    runs = list_runs(path_runs)
+    if run_ids is not None:
+        runs = runs[runs["run_id"].isin(run_ids)]
+    metrics = load_metrics(list(runs["run_id"]), keys, path_runs)
+
+    # Summarise each metric per run, in logged order, and join onto the run parameters
+    summary = metrics.groupby(["run_id", "key"], sort=False)["value"].agg(aggregate).unstack("key")
+    return runs.merge(summary, how="left", left_on="run_id", right_index=True)
@@ -0,0 +1,348 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+
+# Load the environment variable for the `data` folder
+DIR_DATA = os.getenv("DIR_DATA")
+
+# Define the default size of each chunk in bytes; files are split into chunks of this size, and each unique chunk is
+# stored once in the object store. Files no larger than this are a single chunk, so can be restored as hardlinks if
+# requested
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _hash_chunk(chunk: bytes) -> str:
+    """Hash a chunk of a file.
+
+    Args:
+        chunk (bytes): Contents of the chunk.
+
+    Returns:
+        The hexadecimal hash of the chunk.
+
+    """
+    return hashlib.blake2b(chunk, digest_size=20).hexdigest()
+
+
+def _default_store() -> str:
+    """Get the default object store folder, which is a hidden `.snapshots` folder in the `data` folder.
+
+    Returns:
+        The folder path to the default object store.
+
+    """
+    if DIR_DATA is None:
+        raise EnvironmentError("`DIR_DATA` is not set; load the environment variables, or pass `path_store`")
+    return os.path.join(DIR_DATA, ".snapshots")
+
+
+def _path_object(path_store: str, digest: str) -> str:
+    """Get the file path to a chunk in the object store, fanned out into sub-folders by the first two characters.
+
+    Args:
+        path_store (str): Folder path to the object store.
+        digest (str): Hexadecimal hash of the chunk.
+
+    Returns:
+        The file path to the chunk.
+
+    """
+    return os.path.join(path_store, "objects", digest[:2], digest[2:])
+
+
+def _path_manifest(path_store: str, name: str) -> str:
+    """Get the file path to a snapshot manifest in the object store.
+
+    Args:
+        path_store (str): Folder path to the object store.
+        name (str): Name of the snapshot.
+
+    Returns:
+        The file path to the snapshot manifest.
+
+    """
+    return os.path.join(path_store, "snapshots", f"{name}.json")
+
+
+def _store_file(path_file: str, path_store: str, chunk_size: int) -> List[str]:
+    """Split a file into chunks, hash each chunk, and write any new chunks to the object store.
+
+    Args:
+        path_file (str): File path to the file to store.
+        path_store (str): Folder path to the object store.
+        chunk_size (int): Size of each chunk in bytes.
+
+    Returns:
+        A list of the chunk hashes, in file order.
+
+    """
+    digests = []
+    with open(path_file, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+
+            # `hashlib` releases the GIL whilst hashing large buffers, so files are hashed in parallel across threads
+            digest = _hash_chunk(chunk)
+            digests.append(digest)
+
+            # Write the chunk only if it is not already in the object store, or a stored chunk has the wrong size;
+            # write to a temporary file first, so a partially written chunk is never stored under its hash
+            path_object = _path_object(path_store, digest)
+            if not os.path.exists(path_object) or os.path.getsize(path_object) != len(chunk):
+                os.makedirs(os.path.dirname(path_object), exist_ok=True)
+                path_temp = f"{path_object}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(path_temp, "wb") as f_object:
+                    f_object.write(chunk)
+
+                # Make the chunk read-only, as files restored with `link=True` are hardlinks to it
+                os.chmod(path_temp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                os.replace(path_temp, path_object)
+    return digests
+
+
+def _walk_files(path_root: str, path_store: str) -> List[Tuple[str, os.stat_result]]:
+    """Get all files under a folder, excluding the object store, with their file statuses.
+
+    Args:
+        path_root (str): Folder path to walk.
+        path_store (str): Folder path to the object store, which is excluded.
+
+    Returns:
+        A list of tuples of the file path relative to path_root, and its file status.
+
+    """
+    files = []
+    real_store = os.path.realpath(path_store)
+    for root, dirs, filenames in os.walk(path_root):
+        dirs[:] = [d for d in dirs if os.path.realpath(os.path.join(root, d)) != real_store]
+        for filename in filenames:
+            path_file = os.path.join(root, filename)
+            if os.path.isfile(path_file):
+                files.append((os.path.relpath(path_file, path_root), os.stat(path_file)))
+    return files
+
+
+def list_snapshots(path_store: Optional[str] = None) -> List[str]:
+    """List all snapshots in the object store, oldest first.
+
+    Args:
+        path_store (Optional[str]): Default: None. Folder path to the object store; if None, this is a `.snapshots`
+            folder in `DIR_DATA`.
+
+    Returns:
+        A list of snapshot names.
+
+    """
+    path_snapshots = os.path.join(path_store or _default_store(), "snapshots")
+    if not os.path.isdir(path_snapshots):
+        return []
+    manifests = [os.path.join(path_snapshots, f) for f in os.listdir(path_snapshots) if f.endswith(".json")]
+    manifests.sort(key=lambda p: (os.stat(p).st_mtime_ns, p))
+    return [os.path.splitext(os.path.basename(p))[0] for p in manifests]
+
+
+def _load_manifest(path_store: str, name: str) -> Dict[str, Any]:
+    """Load a snapshot manifest from the object store.
+
+    Args:
+        path_store (str): Folder path to the object store.
+        name (str): Name of the snapshot.
+
+    Returns:
+        The snapshot manifest.
+
+    """
+    with open(_path_manifest(path_store, name)) as f:
+        return json.load(f)
+
+
+def snapshot(path_root: Optional[str] = None, name: Optional[str] = None, path_store: Optional[str] = None,
+             chunk_size: int = CHUNK_SIZE, max_workers: Optional[int] = None) -> str:
+    """Take a deduplicated, content-addressed snapshot of a folder.
+
+    Files are split into chunks, and each unique chunk is stored once in the object store. Files whose size and
+    modification time are unchanged since the last snapshot of the same folder are not re-read, so re-snapshotting an
+    unchanged folder only needs to check file statuses.
+
+    Args:
+        path_root (Optional[str]): Default: None. Folder path to snapshot; if None, this is `DIR_DATA`.
+        name (Optional[str]): Default: None. Name of the snapshot; if None, the current date and time is used.
+        path_store (Optional[str]): Default: None. Folder path to the object store; if None, this is a `.snapshots`
+            folder in `DIR_DATA`.
+        chunk_size (int): Default: 4 MiB. Size of each chunk in bytes.
+        max_workers (Optional[int]): Default: None. Number of threads used to hash files; if None, this is the
+            `ThreadPoolExecutor` default.
+
+    Returns:
+        The name of the snapshot.
+
+    """
+
+    # Set the default folder paths, and snapshot name
+    path_root = os.path.abspath(path_root or os.path.dirname(_default_store()))
+    path_store = os.path.abspath(path_store or _default_store())
+    name = name or datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    if os.path.exists(_path_manifest(path_store, name)):
+        raise FileExistsError(f"Snapshot already exists: {name}")
+
+    # Get the file entries from the most recent snapshot of the same folder, to skip unchanged files
+    previous = {}
+    for previous_name in reversed(list_snapshots(path_store)):
+        manifest = _load_manifest(path_store, previous_name)
+        if manifest["root"] == path_root and manifest["chunk_size"] == chunk_size:
+            previous = manifest["files"]
+            break
+
+    # Split the files into those unchanged since the previous snapshot, and those that need to be hashed
+    files, to_hash = {}, []
+    for path_relative, file_stat in _walk_files(path_root, path_store):
+        entry = {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns, "mode": file_stat.st_mode & 0o777}
+        entry_previous = previous.get(path_relative)
+        if entry_previous and all(entry_previous[k] == v for k, v in entry.items()):
+            files[path_relative] = entry_previous
+        else:
+            files[path_relative] = entry
+            to_hash.append(path_relative)
+
+    # Hash, and store the changed files in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        chunks = pool.map(lambda p: _store_file(os.path.join(path_root, p), path_store, chunk_size), to_hash)
+        for path_relative, digests in zip(to_hash, chunks):
+            files[path_relative]["chunks"] = digests
+
+    # Write the manifest last, so an interrupted snapshot is never listed
+    path_manifest = _path_manifest(path_store, name)
+    os.makedirs(os.path.dirname(path_manifest), exist_ok=True)
+    with open(f"{path_manifest}.tmp", "w") as f:
+        json.dump({"root": path_root, "chunk_size": chunk_size, "files": files}, f)
+    os.replace(f"{path_manifest}.tmp", path_manifest)
+    return name
+
+
+def _verify_chunk(path_object: str, digest: str) -> None:
+    """Check a chunk in the object store still matches its hash.
+
+    Args:
+        path_object (str): File path to the chunk.
+        digest (str): Expected hexadecimal hash of the chunk.
+
+    Returns:
+        None. Raises a ValueError if the chunk does not match digest.
+
+    """
+    with open(path_object, "rb") as f:
+        if _hash_chunk(f.read()) != digest:
+            raise ValueError(f"Chunk in the object store is corrupted: {path_object}")
+
+
+def _copy_chunks(paths_object: List[str], path_file: str) -> None:
+    """Concatenate chunks from the object store into a new file.
+
+    `os.copy_file_range` is used where available, which lets copy-on-write filesystems, such as Btrfs or XFS, share
+    the underlying data as a reflink rather than duplicating it; if it fails, a plain copy is used instead. Either way,
+    the new file is independent of the object store, so modifying it does not modify any snapshot.
+
+    Args:
+        paths_object (List[str]): File paths to the chunks, in file order.
+        path_file (str): File path to the new file.
+
+    Returns:
+        None. A new file is created at path_file.
+
+    """
+    use_copy_file_range = hasattr(os, "copy_file_range")
+    with open(path_file, "wb") as f_out:
+        for path_object in paths_object:
+            with open(path_object, "rb") as f_in:
+                if use_copy_file_range:
+                    size = os.fstat(f_in.fileno()).st_size
+                    try:
+                        while size > 0:
+                            copied = os.copy_file_range(f_in.fileno(), f_out.fileno(), size)
+                            if copied == 0:
+                                break
+                            size -= copied
+                    except OSError:
+                        # Fall back to a plain copy for the rest of the file if `os.copy_file_range` is not supported
+                        # here at runtime, for example across filesystems (EXDEV), or by this filesystem (EINVAL or
+                        # EOPNOTSUPP); resume from the offsets it reached
+                        use_copy_file_range = False
+                        f_in.seek(os.lseek(f_in.fileno(), 0, os.SEEK_CUR))
+                        f_out.seek(os.lseek(f_out.fileno(), 0, os.SEEK_CUR))
+                if not use_copy_file_range:
+                    shutil.copyfileobj(f_in, f_out)
+
+
+def restore(name: str, path_target: str, path_store: Optional[str] = None, link: bool = False) -> None:
+    """Restore a snapshot to a folder.
+
+    Files are restored as independent copies, which share data with the object store on copy-on-write filesystems.
+    Every chunk is checked against its hash before it is restored, so a corrupted object store raises an error rather
+    than being silently restored.
+
+    Set link to True to restore single-chunk files as hardlinks to the object store, which take up no extra space on
+    any filesystem. Hardlinked files are read-only, but **modifying them anyway, for example as root or after
+    `chmod +w`, corrupts every snapshot that shares their contents**.
+
+    Args:
+        name (str): Name of the snapshot to restore.
+        path_target (str): Folder path to restore the snapshot to; this must not exist, or be empty.
+        path_store (Optional[str]): Default: None. Folder path to the object store; if None, this is a `.snapshots`
+            folder in `DIR_DATA`.
+        link (bool): Default: False. If True, restore single-chunk files as hardlinks.
+
+    Returns:
+        None. The snapshot files are restored to path_target.
+
+    """
+    path_store = path_store or _default_store()
+    if os.path.isdir(path_target) and os.listdir(path_target):
+        raise FileExistsError(f"Target folder is not empty: {path_target}")
+
+    for path_relative, entry in _load_manifest(path_store, name)["files"].items():
+        path_file = os.path.join(path_target, path_relative)
+        os.makedirs(os.path.dirname(path_file), exist_ok=True)
+        paths_object = [_path_object(path_store, d) for d in entry["chunks"]]
+        for path_object, digest in zip(paths_object, entry["chunks"]):
+            _verify_chunk(path_object, digest)
+
+        # Hardlink single-chunk files if requested, falling back to a copy if the target is on a different filesystem
+        if link and len(paths_object) == 1:
+            try:
+                os.link(paths_object[0], path_file)
+                continue
+            except OSError:
+                pass
+        _copy_chunks(paths_object, path_file)
+        os.chmod(path_file, entry["mode"])
+
+
+if __name__ == "__main__":
+
+    # Parse the command line arguments
+    parser = argparse.ArgumentParser(description="Take, list, and restore deduplicated snapshots of the data folder.")
+    parser.add_argument("--store", default=None, help="Folder path to the object store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_snapshot = subparsers.add_parser("snapshot", help="Take a snapshot of a folder.")
+    parser_snapshot.add_argument("path", nargs="?", default=None, help="Folder to snapshot; defaults to `DIR_DATA`.")
+    parser_snapshot.add_argument("--name", default=None, help="Name of the snapshot.")
+    subparsers.add_parser("list", help="List all snapshots, oldest first.")
+    parser_restore = subparsers.add_parser("restore", help="Restore a snapshot to a folder.")
+    parser_restore.add_argument("name", help="Name of the snapshot.")
+    parser_restore.add_argument("target", help="Folder to restore the snapshot to.")
+    parser_restore.add_argument("--link", action="store_true", help="Restore read-only hardlinks, not copies.")
+    args = parser.parse_args()
+
+    # Run the selected command
+    if args.command == "snapshot":
+        print(snapshot(args.path, name=args.name, path_store=args.store))
+    elif args.command == "list":
+        print("\n".join(list_snapshots(args.store)))
+    else:
+        restore(args.name, args.target, path_store=args.store, link=args.link)
@@ -0,0 +1,90 @@
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from src.make_models.batch_predict import batch_predict
+
+
+class DoubleModel:
+    """Model that doubles the `x` column, and checks it is only passed the feature columns."""
+
+    def predict(self, df):
+        assert list(df.columns) == ["x"]
+        return df["x"] * 2
+
+
+class FailingModel:
+    """Model that fails on any micro-batch containing a negative value."""
+
+    def predict(self, df):
+        if (df["x"] < 0).any():
+            raise ValueError("Negative value")
+        return df["x"]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Create an input Parquet file, and return a function to save a model with the input and output file paths."""
+    path_input = str(tmp_path / "input.parquet")
+    pd.DataFrame({"id": range(1000), "x": range(1000), "unused": 0.0}).to_parquet(path_input)
+
+    def save_model(model):
+        path_model = str(tmp_path / "model.pkl")
+        with open(path_model, "wb") as f:
+            pickle.dump(model, f)
+        return path_model, path_input, str(tmp_path / "outputs" / "predictions.parquet")
+
+    return save_model
+
+
+def test_row_order_and_ids(paths):
+    """Test that predictions are written in input row order, alongside the identifier columns."""
+    path_model, path_input, path_output = paths(DoubleModel())
+    stats = batch_predict(path_model, path_input, path_output, batch_size=64, max_workers=2, feature_columns=["x"],
+                          id_columns=["id"])
+
+    predictions = pd.read_parquet(path_output)
+    assert stats["rows"] == 1000
+    assert list(predictions.columns) == ["id", "prediction"]
+    assert list(predictions["id"]) == list(range(1000))
+    assert list(predictions["prediction"]) == [2 * i for i in range(1000)]
+
+
+def test_default_features_exclude_ids(paths, tmp_path):
+    """Test that all columns except the identifier columns are passed to the model if no features are specified."""
+    path_model, _, path_output = paths(DoubleModel())
+    path_input = str(tmp_path / "ids_and_x.parquet")
+    pd.DataFrame({"id": range(100), "x": range(100)}).to_parquet(path_input)
+
+    batch_predict(path_model, path_input, path_output, batch_size=16, max_workers=2, id_columns=["id"])
+    predictions = pd.read_parquet(path_output)
+    assert list(predictions["id"]) == list(range(100))
+    assert list(predictions["prediction"]) == [2 * i for i in range(100)]
+
+
+def test_failure_leaves_no_output(paths, tmp_path):
+    """Test that a run failing partway through does not leave a partial output file."""
+    path_model, _, path_output = paths(FailingModel())
+    path_input = str(tmp_path / "failing.parquet")
+    pd.DataFrame({"x": list(range(900)) + [-1] * 100}).to_parquet(path_input)
+
+    with pytest.raises(ValueError, match="Negative value"):
+        batch_predict(path_model, path_input, path_output, batch_size=64, max_workers=2)
+    assert not os.path.exists(path_output)
+    assert not os.path.exists(f"{path_output}.tmp")
+
+
+def test_empty_input_writes_empty_output(paths, tmp_path):
+    """Test that input with no rows writes an empty output file with the identifier and prediction columns."""
+    path_model, _, path_output = paths(DoubleModel())
+    path_input = str(tmp_path / "empty.parquet")
+    pd.DataFrame({"id": pd.Series([], dtype="int64"), "x": pd.Series([], dtype="int64")}).to_parquet(path_input)
+
+    stats = batch_predict(path_model, path_input, path_output, max_workers=1, feature_columns=["x"],
+                          id_columns=["id"])
+    predictions = pd.read_parquet(path_output)
+    assert stats["rows"] == 0
+    assert len(predictions) == 0
+    assert list(predictions.columns) == ["id", "prediction"]
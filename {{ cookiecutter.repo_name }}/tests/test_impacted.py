@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+pytest_plugins = ["pytester"]
+
+# Define the file path to the `conftest.py` file containing the `--impacted` plugin
+PATH_CONFTEST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "conftest.py")
+
+
+@pytest.fixture
+def project(pytester: pytest.Pytester) -> pytest.Pytester:
+    """Create a minimal project with two `src` modules, each with its own test file."""
+    with open(PATH_CONFTEST) as f:
+        pytester.makeconftest(f.read())
+    pytester.makeini("[pytest]\ntestpaths =\n    ./tests\n")
+    pytester.mkpydir("src")
+    pytester.makepyfile(**{
+        "src/a": "def a():\n    return 1\n",
+        "src/b": "def b():\n    return 2\n",
+    })
+    pytester.mkdir("tests")
+    pytester.makepyfile(**{
+        "tests/test_a": "from src.a import a\n\n\ndef test_a():\n    assert a() == 1\n",
+        "tests/test_b": "from src.b import b\n\n\ndef test_b():\n    assert b() == 2\n",
+    })
+    return pytester
+
+
+def run_impacted(pytester: pytest.Pytester, *args: str) -> pytest.RunResult:
+    """Run pytest with `--impacted` in a subprocess, so its coverage tracer does not interfere with this session."""
+    return pytester.runpytest_subprocess("--impacted", *args)
+
+
+def test_first_run_is_full_suite(project):
+    """Test that the full suite runs if there is no test impact map."""
+    result = run_impacted(project)
+    result.stdout.fnmatch_lines(["impacted: running full suite (no test impact map recorded)"])
+    result.assert_outcomes(passed=2)
+
+
+def test_unchanged_deselects_all(project):
+    """Test that no tests run if nothing has changed since the last run."""
+    run_impacted(project)
+    result = run_impacted(project)
+    result.stdout.fnmatch_lines(["impacted: selecting affected tests"])
+    result.assert_outcomes(deselected=2)
+    assert result.ret == 0
+
+
+def test_changed_src_selects_dependent_tests(project):
+    """Test that only the tests depending on a changed `src` file run."""
+    run_impacted(project)
+    project.makepyfile(**{"src/b": "def b():\n    return 2  # changed\n"})
+    result = run_impacted(project)
+    result.assert_outcomes(passed=1, deselected=1)
+    result.stdout.fnmatch_lines(["tests/test_b.py .*"])
+
+
+def test_doctests_selected_by_changes(project):
+    """Test that a doctest is deselected if its file is unchanged, and selected if its file changes."""
+    project.makepyfile(**{"src/c": 'def c():\n    """\n    >>> c()\n    3\n    """\n    return 3\n'})
+    run_impacted(project, "--doctest-modules", "src", "tests")
+    result = run_impacted(project, "--doctest-modules", "src", "tests")
+    result.assert_outcomes(deselected=3)
+
+    project.makepyfile(**{"src/c": 'def c():\n    """\n    >>> c()\n    3\n    """\n    return 1 + 2\n'})
+    result = run_impacted(project, "--doctest-modules", "src", "tests", "-v")
+    result.assert_outcomes(passed=1, deselected=2)
+    result.stdout.fnmatch_lines(["src/c.py::src.c.c PASSED*"])
+
+
+@pytest.mark.parametrize("args", [["-k", "test_a"], ["tests/test_a.py"]])
+def test_partial_run_keeps_affected_tests(project, args):
+    """Test that a change stays visible to tests that did not run, after a run that only selected other tests."""
+    run_impacted(project)
+    project.makepyfile(**{"src/b": "def b():\n    return 3\n"})
+    run_impacted(project, *args)
+    result = run_impacted(project)
+    result.assert_outcomes(failed=1, deselected=1)
+
+
+def test_failed_tests_rerun(project):
+    """Test that failed tests run again, even if nothing has changed."""
+    project.makepyfile(**{"src/b": "def b():\n    return 3\n"})
+    run_impacted(project)
+    result = run_impacted(project)
+    result.assert_outcomes(failed=1, deselected=1)
+
+
+def test_stopped_early_does_not_save(project):
+    """Test that a run stopped early by `-x` does not update the test impact map."""
+    project.makepyfile(**{"src/a": "def a():\n    return 3\n"})
+    run_impacted(project, "-x")
+    result = run_impacted(project)
+    result.stdout.fnmatch_lines(["impacted: running full suite (no test impact map recorded)"])
+
+
+def test_added_src_file_is_stale(project):
+    """Test that the full suite runs if a `src` file is added."""
+    run_impacted(project)
+    project.makepyfile(**{"src/c": "C = 1\n"})
+    result = run_impacted(project)
+    result.stdout.fnmatch_lines(["impacted: running full suite (`src` files added or removed)"])
+    result.assert_outcomes(passed=2)
+
+
+@pytest.mark.parametrize("path_support", ["tests/conftest", "tests/helpers"])
+def test_changed_tests_support_file_is_stale(project, path_support):
+    """Test that the full suite runs if a `tests` support file, such as a fixture or helper module, changes."""
+    project.makepyfile(**{path_support: "VALUE = 1\n"})
+    run_impacted(project)
+    project.makepyfile(**{path_support: "VALUE = 2\n"})
+    result = run_impacted(project)
+    result.stdout.fnmatch_lines(["impacted: running full suite (test configuration or `tests` support files changed)"])
+    result.assert_outcomes(passed=2)
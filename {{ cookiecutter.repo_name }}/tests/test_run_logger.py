@@ -0,0 +1,62 @@
+import pytest
+
+from src.utils.run_logger import RunLogger, compare_runs, list_runs, load_metrics
+
+
+def test_flush_on_close(tmp_path):
+    """Test that all buffered metric values are written when the logger is closed."""
+    with RunLogger({"learning_rate": 0.1}, path_runs=str(tmp_path), flush_every=10**9, flush_interval=60) as run:
+        for step in range(100):
+            run.log({"loss": 1 / (step + 1), "accuracy": step / 100}, step=step)
+
+    metrics = load_metrics(path_runs=str(tmp_path))
+    assert len(metrics) == 200
+    assert list(metrics.loc[metrics["key"] == "loss", "step"]) == list(range(100))
+    assert list(list_runs(str(tmp_path))["learning_rate"]) == [0.1]
+
+
+def test_full_buffer_waits_for_writer(tmp_path):
+    """Test that logging more values than the buffer holds waits for the writer, rather than dropping values."""
+    with RunLogger(path_runs=str(tmp_path), max_buffer=10, flush_every=10**9, flush_interval=60) as run:
+        for step in range(1000):
+            run.log({"loss": step}, step=step)
+
+    assert list(load_metrics(path_runs=str(tmp_path))["value"]) == list(range(1000))
+
+
+def test_compare_runs(tmp_path):
+    """Test that runs are compared by their parameters, and summarised metrics."""
+    for learning_rate in (0.1, 0.01):
+        with RunLogger({"learning_rate": learning_rate}, path_runs=str(tmp_path)) as run:
+            for step in range(10):
+                run.log({"loss": learning_rate * (10 - step)}, step=step)
+
+    runs = compare_runs(["loss"], aggregate="min", path_runs=str(tmp_path))
+    assert list(runs["learning_rate"]) == [0.1, 0.01]
+    assert list(runs["loss"]) == pytest.approx([0.1, 0.01])
+
+
+@pytest.mark.parametrize("metrics, step", [({"loss": "high"}, None), ({"loss": 1.0}, "first")])
+def test_invalid_values_raise_in_log(tmp_path, metrics, step):
+    """Test that invalid values raise an error when logged, and do not stop the logger."""
+    with RunLogger(path_runs=str(tmp_path)) as run:
+        with pytest.raises(ValueError):
+            run.log(metrics, step=step)
+        run.log({"loss": 1.0}, step=1)
+
+    assert len(load_metrics(path_runs=str(tmp_path))) == 1
+
+
+def test_writer_error_is_raised(tmp_path, monkeypatch):
+    """Test that an error in the writer thread is raised by `log` and `close`, rather than hanging."""
+
+    def fail(self, rows):
+        raise OSError("Disk full")
+
+    monkeypatch.setattr(RunLogger, "_write", fail)
+    run = RunLogger(path_runs=str(tmp_path), max_buffer=5, flush_every=1, flush_interval=60)
+    with pytest.raises(OSError, match="Disk full"):
+        for step in range(50):
+            run.log({"loss": 1.0}, step=step)
+    with pytest.raises(OSError, match="Disk full"):
+        run.close()
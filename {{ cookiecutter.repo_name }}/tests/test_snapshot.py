@@ -0,0 +1,124 @@
+import errno
+import os
+import stat
+
+import pytest
+
+from src.utils import snapshot as snapshot_module
+from src.utils.snapshot import list_snapshots, restore, snapshot
+
+# Define the files to snapshot; with the 16-byte chunks used in these tests, `dup.csv` shares its only chunk with
+# `small.csv`, and `big.csv` is four identical chunks, so only two unique chunks are stored
+FILES = {
+    "small.csv": b"a,b\n1,2\n",
+    "dup.csv": b"a,b\n1,2\n",
+    "empty.csv": b"",
+    "raw/big.csv": b"0123456789abcdef" * 4,
+}
+
+
+@pytest.fixture
+def folders(tmp_path):
+    """Create a folder of data files, and return its path with a path for the object store."""
+    path_root = tmp_path / "data"
+    for path_relative, contents in FILES.items():
+        (path_root / path_relative).parent.mkdir(parents=True, exist_ok=True)
+        (path_root / path_relative).write_bytes(contents)
+    return str(path_root), str(tmp_path / "store")
+
+
+def read_folder(path_root):
+    """Read all the files in a folder into a dictionary of their relative file paths and contents."""
+    contents = {}
+    for root, _, filenames in os.walk(path_root):
+        for filename in filenames:
+            path_file = os.path.join(root, filename)
+            with open(path_file, "rb") as f:
+                contents[os.path.relpath(path_file, path_root).replace(os.sep, "/")] = f.read()
+    return contents
+
+
+def test_snapshot_restore_round_trip(folders, tmp_path):
+    """Test that a restored snapshot matches the original folder, and duplicate chunks are stored once."""
+    path_root, path_store = folders
+    name = snapshot(path_root, name="s1", path_store=path_store, chunk_size=16)
+    restore(name, str(tmp_path / "restored"), path_store=path_store)
+
+    assert list_snapshots(path_store) == ["s1"]
+    assert read_folder(tmp_path / "restored") == FILES
+    assert len(read_folder(os.path.join(path_store, "objects"))) == 2
+
+
+def test_unchanged_resnapshot_does_not_read_files(folders, monkeypatch):
+    """Test that re-snapshotting an unchanged folder does not re-read any files."""
+    path_root, path_store = folders
+    snapshot(path_root, name="s1", path_store=path_store, chunk_size=16)
+
+    def fail(*args):
+        raise AssertionError("File was re-read")
+
+    monkeypatch.setattr(snapshot_module, "_store_file", fail)
+    snapshot(path_root, name="s2", path_store=path_store, chunk_size=16)
+    assert list_snapshots(path_store) == ["s1", "s2"]
+
+
+def test_changed_file_is_resnapshotted(folders, tmp_path):
+    """Test that a changed file is re-read, and both snapshots restore their own version."""
+    path_root, path_store = folders
+    snapshot(path_root, name="s1", path_store=path_store, chunk_size=16)
+    with open(os.path.join(path_root, "small.csv"), "ab") as f:
+        f.write(b"3,4\n")
+    snapshot(path_root, name="s2", path_store=path_store, chunk_size=16)
+
+    restore("s1", str(tmp_path / "s1"), path_store=path_store)
+    restore("s2", str(tmp_path / "s2"), path_store=path_store)
+    assert read_folder(tmp_path / "s1")["small.csv"] == FILES["small.csv"]
+    assert read_folder(tmp_path / "s2")["small.csv"] == FILES["small.csv"] + b"3,4\n"
+
+
+def test_restored_copies_are_independent(folders, tmp_path):
+    """Test that modifying a file restored by default does not modify the snapshot."""
+    path_root, path_store = folders
+    snapshot(path_root, name="s1", path_store=path_store, chunk_size=16)
+    restore("s1", str(tmp_path / "first"), path_store=path_store)
+    with open(tmp_path / "first" / "small.csv", "w") as f:
+        f.write("corrupted")
+
+    restore("s1", str(tmp_path / "second"), path_store=path_store)
+    assert read_folder(tmp_path / "second") == FILES
+
+
+def test_restore_falls_back_if_copy_file_range_fails(folders, tmp_path, monkeypatch):
+    """Test that files are still restored if `os.copy_file_range` fails, for example across filesystems."""
+    path_root, path_store = folders
+    snapshot(path_root, name="s1", path_store=path_store, chunk_size=16)
+
+    def copy_file_range(*args, **kwargs):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(os, "copy_file_range", copy_file_range, raising=False)
+    restore("s1", str(tmp_path / "restored"), path_store=path_store)
+    assert read_folder(tmp_path / "restored") == FILES
+
+
+def test_corrupted_chunk_raises(folders, tmp_path):
+    """Test that restoring from a corrupted object store raises an error, rather than restoring corrupted data."""
+    path_root, path_store = folders
+    snapshot(path_root, name="s1", path_store=path_store, chunk_size=16)
+    restore("s1", str(tmp_path / "linked"), path_store=path_store, link=True)
+
+    # Modify a hardlinked file, as a user with write permissions, such as root, could
+    path_linked = tmp_path / "linked" / "small.csv"
+    os.chmod(path_linked, stat.S_IRUSR | stat.S_IWUSR)
+    path_linked.write_text("corrupted")
+
+    with pytest.raises(ValueError, match="corrupted"):
+        restore("s1", str(tmp_path / "second"), path_store=path_store)
+
+
+def test_restore_to_non_empty_folder_raises(folders, tmp_path):
+    """Test that restoring to a non-empty folder raises an error."""
+    path_root, path_store = folders
+    snapshot(path_root, name="s1", path_store=path_store, chunk_size=16)
+    with pytest.raises(FileExistsError):
+        restore("s1", path_root, path_store=path_store)